@@ -209,7 +209,7 @@ class SeriesCredits(CreditUpdater):
 class MiscCredits(CreditUpdater):
 
     def __init__(self, wiki, pages):
-        self.proposals = pyscp.wikidot.Wiki('scp-wiki')('scp-001').links
+        self.proposals = set(pyscp.wikidot.Wiki('scp-wiki')('scp-001').links)
         super().__init__(wiki, pages)
 
     def keys(self):
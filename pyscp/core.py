@@ -27,7 +27,10 @@ import bs4
 import collections
 import functools
 import itertools
+import lxml.etree
+import lxml.html
 import re
+import soupsieve
 import urllib.parse
 import logging
 
@@ -39,6 +42,18 @@ import pyscp.utils
 
 log = logging.getLogger(__name__)
 
+RE_WORD = re.compile(r"[\w'█_-]+")
+RE_MAINLIST = re.compile(r"/scp-[0-9]{3,4}$")
+
+SEL_LINKS = soupsieve.compile("#page-content a")
+SEL_BREADCRUMBS = soupsieve.compile("#breadcrumbs a")
+SEL_SERIES_ITEMS = soupsieve.compile("ul > li")
+
+XPATH_TEXT = lxml.etree.XPath(
+    '//*[@id="page-content"]//text()[not(parent::script or parent::style)]'
+)
+XPATH_PRESERVED = lxml.etree.XPath("ancestor-or-self::*[self::pre or self::textarea]")
+
 ###############################################################################
 # Abstract Base Classes
 ###############################################################################
@@ -61,6 +76,8 @@ class Page(metaclass=abc.ABCMeta):
     attached to that wiki.
     """
 
+    __slots__ = ("url", "_wiki", "_cache")
+
     ###########################################################################
     # Special Methods
     ###########################################################################
@@ -145,8 +162,7 @@ class Page(metaclass=abc.ABCMeta):
     @property
     def _raw_title(self):
         """Title as displayed on the page."""
-        title = self._soup.find(id="page-title")
-        return title.text.strip() if title else ""
+        return self._parsed[0]
 
     @property
     def _raw_author(self):
@@ -157,6 +173,34 @@ class Page(metaclass=abc.ABCMeta):
         """BeautifulSoup of the contents of the page."""
         return bs4.BeautifulSoup(self.html, "lxml")
 
+    @pyscp.utils.cached_property
+    def _parsed(self):
+        """
+        Raw title, links and parent url, taken from a single parse.
+
+        Only these small values are cached; the soup itself is dropped so
+        that long-lived pages don't hold on to the whole parse tree.
+        """
+        soup = self._soup
+        title = soup.find(id="page-title")
+        title = title.text.strip() if title else ""
+        links, unique = [], set()
+        for element in SEL_LINKS.select(soup):
+            href = element.get("href", None)
+            if (
+                not href
+                or href[0] != "/"
+                or href[-4:] in (".png", ".jpg", ".gif")  # bad or absolute link
+            ):
+                continue
+            url = self._wiki.site + href.rstrip("|")
+            if url not in unique:
+                unique.add(url)
+                links.append(url)
+        breadcrumb = SEL_BREADCRUMBS.select(soup)
+        parent = self._wiki.site + breadcrumb[-1]["href"] if breadcrumb else None
+        return title, tuple(links), parent
+
     ###########################################################################
     # Properties
     ###########################################################################
@@ -176,15 +220,26 @@ class Page(metaclass=abc.ABCMeta):
         """Alias for Page.posts."""
         return self._thread.posts
 
-    @property
+    @pyscp.utils.cached_property
     def text(self):
         """Plain text of the page."""
-        return self._soup.find(id="page-content").text
+        text = []
+        for string in XPATH_TEXT(lxml.html.fromstring(self.html)):
+            collapsed = pyscp.utils.collapse_whitespace(string)
+            if collapsed != string:
+                # like BeautifulSoup, keep whitespace inside pre and textarea
+                parent = string.getparent()
+                if string.is_tail:
+                    parent = parent.getparent()
+                if not XPATH_PRESERVED(parent):
+                    string = collapsed
+            text.append(string)
+        return "".join(text)
 
     @property
     def wordcount(self):
         """Number of words encountered on the page."""
-        return len(re.findall(r"[\w'█_-]+", self.text))
+        return len(RE_WORD.findall(self.text))
 
     @property
     def images(self):
@@ -222,7 +277,7 @@ class Page(metaclass=abc.ABCMeta):
         and subsequent maintenance of the page. The values of the dict
         describe the user's relationship to the page.
         """
-        data = [i for i in self._wiki.metadata() if i.url == self.url]
+        data = self._wiki._metadata_index().get(self.url, [])
         data = {i.user: i for i in data}
 
         if "author" not in {i.role for i in data.values()}:
@@ -241,7 +296,6 @@ class Page(metaclass=abc.ABCMeta):
         return sum(v.value for v in self.votes if v.user != "(account deleted)")
 
     @property
-    @pyscp.utils.listify()
     def links(self):
         """
         Other pages linked from this one.
@@ -249,28 +303,14 @@ class Page(metaclass=abc.ABCMeta):
         Returns an ordered list of unique urls. Off-site links or links to
         images are not included.
         """
-        unique = set()
-        for element in self._soup.select("#page-content a"):
-            href = element.get("href", None)
-            if (
-                not href
-                or href[0] != "/"
-                or href[-4:] in (".png", ".jpg", ".gif")  # bad or absolute link
-            ):
-                continue
-            url = self._wiki.site + href.rstrip("|")
-            if url not in unique:
-                unique.add(url)
-                yield url
+        return list(self._parsed[1])
 
     @property
     def parent(self):
         """Parent of the current page."""
         if not self.html:
             return None
-        breadcrumb = self._soup.select("#breadcrumbs a")
-        if breadcrumb:
-            return self._wiki.site + breadcrumb[-1]["href"]
+        return self._parsed[2]
 
     @property
     def is_mainlist(self):
@@ -283,7 +323,7 @@ class Page(metaclass=abc.ABCMeta):
             return False
         if "scp" not in self.tags:
             return False
-        return bool(re.search(r"/scp-[0-9]{3,4}$", self.url))
+        return bool(RE_MAINLIST.search(self.url))
 
     ###########################################################################
     # Methods
@@ -312,7 +352,7 @@ class Page(metaclass=abc.ABCMeta):
         for i in items:
             user = user_formatter.format(i.user) if user_formatter else i.user
             key = (i.role, i.date)
-            itemdict[key] = itemdict.get(key, []) + [user]
+            itemdict.setdefault(key, []).append(user)
 
         output = []
 
@@ -418,6 +458,14 @@ class Wiki(metaclass=abc.ABCMeta):
             results.append(pyscp.core.Metadata(url, user, type_, date))
         return results
 
+    @functools.lru_cache(maxsize=1)
+    def _metadata_index(self):
+        """Page ownership metadata grouped by url."""
+        index = collections.defaultdict(list)
+        for meta in self.metadata():
+            index[meta.url].append(meta)
+        return dict(index)
+
     def _update_titles(self):
         for name in (
             "scp-series",
@@ -447,7 +495,7 @@ class Wiki(metaclass=abc.ABCMeta):
 
         self._update_titles()
 
-        elems = [i.select("ul > li") for i in self._title_data.values()]
+        elems = [SEL_SERIES_ITEMS.select(i) for i in self._title_data.values()]
         elems = list(itertools.chain(*elems))
         try:
             elems += list(self("scp-001")._soup(class_="series")[1]("p"))
@@ -8,8 +8,10 @@ import concurrent.futures
 import logging
 import peewee
 import queue
+import sqlite3
+import threading
 
-from itertools import islice
+from itertools import chain, islice
 
 ###############################################################################
 # Global Constants And Variables
@@ -18,6 +20,25 @@ from itertools import islice
 log = logging.getLogger("pyscp.orm")
 pool = concurrent.futures.ThreadPoolExecutor(max_workers=1)
 queue = queue.Queue()
+id_lock = threading.Lock()
+
+# default compile-time limit on the number of bound parameters per statement
+if sqlite3.sqlite_version_info >= (3, 32, 0):
+    SQLITE_MAX_VARIABLE_NUMBER = 32766
+else:
+    SQLITE_MAX_VARIABLE_NUMBER = 999
+
+# set on every new connection; these don't write to the database file,
+# so they are safe for read-only snapshots too
+PRAGMAS = (
+    ("cache_size", -65536),
+    ("temp_store", "memory"),
+    ("mmap_size", 268435456),
+)
+
+# only for databases being written; WAL lets the snapshot readers run
+# alongside the writer queue, and relaxed syncing is safe in WAL mode
+WRITE_PRAGMAS = (("journal_mode", "wal"), ("synchronous", "normal"))
 
 
 def queue_execution(fn, args=(), kw={}):
@@ -43,35 +64,37 @@ class BaseModel(peewee.Model):
     @classmethod
     def create_table(cls):
         if not hasattr(cls, "_id_cache"):
-            cls._id_cache = []
+            cls._id_cache = {}
         queue_execution(fn=super().create_table, args=(True,))
 
     @classmethod
     def insert_many(cls, data):
         data_iter = iter(data)
-        chunk = list(islice(data_iter, 500))
+        first = next(data_iter, None)
+        if first is None:
+            return
+        # insert as many rows per statement as sqlite will accept
+        size = max(1, SQLITE_MAX_VARIABLE_NUMBER // len(first))
+        data_iter = chain([first], data_iter)
+        chunk = list(islice(data_iter, size))
         while chunk:
             queue_execution(
                 fn=lambda x: super(BaseModel, cls).insert_many(x).execute(),
                 args=(chunk,),
             )
-            chunk = list(islice(data_iter, 500))
+            chunk = list(islice(data_iter, size))
 
     @classmethod
     def convert_to_id(cls, data, key="user"):
         for row in data:
-            if row[key] not in cls._id_cache:
-                cls._id_cache.append(row[key])
-            row[key] = cls._id_cache.index(row[key]) + 1
+            with id_lock:
+                row[key] = cls._id_cache.setdefault(row[key], len(cls._id_cache) + 1)
             yield row
 
     @classmethod
     def write_ids(cls, field_name):
         cls.insert_many(
-            [
-                {"id": cls._id_cache.index(value) + 1, field_name: value}
-                for value in set(cls._id_cache)
-            ]
+            [{"id": id_, field_name: value} for value, id_ in cls._id_cache.items()]
         )
         cls._id_cache.clear()
 
@@ -180,9 +203,9 @@ def create_tables(*tables):
         eval(table).create_table()
 
 
-def connect(dbpath):
+def connect(dbpath, pragmas=PRAGMAS):
     log.info("Connecting to the database at {}".format(dbpath))
-    db.initialize(peewee.SqliteDatabase(dbpath))
+    db.initialize(peewee.SqliteDatabase(dbpath, pragmas=pragmas))
     db.connect()
 
 
@@ -193,9 +216,16 @@ def connect(dbpath):
 
 def votes_by_user(user):
     up, down = [], []
-    for vote in Vote.select().join(User).where(User.name == user):
-        if vote.value == 1:
-            up.append(vote.page.url)
+    query = (
+        Vote.select(Vote.value, Page.url)
+        .join(User)
+        .switch(Vote)
+        .join(Page)
+        .where(User.name == user)
+    )
+    for value, url in query.tuples():
+        if value == 1:
+            up.append(url)
         else:
-            down.append(vote.page.url)
+            down.append(url)
     return {"+": up, "-": down}
@@ -12,6 +12,7 @@ and communication with the sqlite Snapshots.
 ###############################################################################
 
 import bs4
+import collections
 import concurrent.futures
 import functools
 import itertools
@@ -29,12 +30,16 @@ from pyscp import wikidot, core, orm, utils
 
 log = logging.getLogger(__name__)
 
+RE_OPERATOR = re.compile(r"(\d+)")
+
 ###############################################################################
 
 
 class Page(core.Page):
     """Page object."""
 
+    __slots__ = ()
+
     ###########################################################################
     # Internal Methods
     ###########################################################################
@@ -81,7 +86,7 @@ class Page(core.Page):
     @utils.cached_property
     def tags(self):
         """Return the set of tags with which the page is tagged."""
-        return {pt.tag.name for pt in self._query("PageTag", "Tag")}
+        return set(self._wiki._page_tags().get(self._id, ()))
 
 
 class Thread(core.Thread):
@@ -154,7 +159,7 @@ class Wiki(core.Wiki):
 
     @staticmethod
     def _get_operator(string):
-        symbol, *values = re.split(r"(\d+)", string)
+        symbol, *values = RE_OPERATOR.split(string)
         opdict = {">": "gt", "<": "lt", ">=": "ge", "<=": "le", "=": "eq", "": "eq"}
         if symbol not in opdict:
             raise ValueError
@@ -183,15 +188,34 @@ class Wiki(core.Wiki):
             )
         )
 
+    @functools.lru_cache(maxsize=1)
+    def _page_tags(self):
+        """Preload the tags of all pages, keyed by page id."""
+        query = orm.PageTag.select(orm.PageTag.page, orm.Tag.name).join(orm.Tag)
+        tags = collections.defaultdict(set)
+        for page_id, name in query.tuples():
+            tags[page_id].add(name)
+        return dict(tags)
+
     def _list_pages_parsed(self, **kwargs):
-        query = orm.Page.select(orm.Page.url)
+        pt = orm.Page
+        query = pt.select(pt.id, pt.url, pt.thread, pt.source)
         keys = ("author", "tag", "rating", "created")
         keys = [k for k in keys if k in kwargs]
-        for k in keys:
-            query = query & getattr(self, "_filter_" + k)(kwargs[k])
+        if keys:
+            urls = pt.select(pt.url)
+            for k in keys:
+                urls = urls & getattr(self, "_filter_" + k)(kwargs[k])
+            query = query.where(pt.url << urls)
+        # urls used to come back sorted from the url index or the intersect
+        query = query.order_by(pt.url)
         if "limit" in kwargs:
             query = query.limit(kwargs["limit"])
-        return map(self, [p.url for p in query])
+        for page_id, url, thread_id, source in query.tuples():
+            page = self(url)
+            # seed the page with its row to avoid querying for it again
+            page._cache = {"_pdata": (page_id, thread_id, source)}
+            yield page
 
     ###########################################################################
     # SCP-Wiki Specific Methods
@@ -227,16 +251,24 @@ class SnapshotCreator:
     metadata is saved.
     """
 
-    def __init__(self, dbpath):
+    def __init__(self, dbpath, max_workers=20):
         """Create an instance."""
         if pathlib.Path(dbpath).exists():
             raise FileExistsError(dbpath)
-        orm.connect(dbpath)
-        self.pool = concurrent.futures.ThreadPoolExecutor(max_workers=20)
+        orm.connect(dbpath, pragmas=orm.PRAGMAS + orm.WRITE_PRAGMAS)
+        self.max_workers = max_workers
+        self.pool = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+        # separate pool for requests issued from within self.pool workers,
+        # submitting those to self.pool itself could deadlock it
+        self.fetch_pool = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
 
     def take_snapshot(self, wiki, forums=False):
         """Take new snapshot."""
-        self.wiki = wikidot.Wiki(wiki)
+        # the page pool, the fetch pool, the wiki's pager pool and the page
+        # listing in this thread all issue requests at the same time, keep a
+        # connection alive for each of them
+        pool_size = 2 * self.max_workers + wikidot.PAGER_WORKERS + 1
+        self.wiki = wikidot.Wiki(wiki, pool_size=pool_size)
         self._save_all_pages()
         if forums:
             self._save_forums()
@@ -247,6 +279,10 @@ class SnapshotCreator:
         orm.queue.join()
         log.info("Snapshot succesfully taken.")
 
+    def _imap(self, fn, *iterables):
+        """Map over the pool without waiting for the input to be exhausted."""
+        return utils.imap(self.pool, fn, *iterables, ahead=2 * self.max_workers)
+
     def _save_all_pages(self):
         """Iterate over the site pages, call _save_page for each."""
         orm.create_tables(
@@ -262,19 +298,28 @@ class SnapshotCreator:
         count = next(self.wiki.list_pages(body="total", limit=1))._body["total"]
         bar = utils.ProgressBar("SAVING PAGES".ljust(20), int(count))
         bar.start()
-        for _ in self.pool.map(self._save_page, self.wiki.list_pages()):
+        for _ in self._imap(self._save_page, self.wiki.list_pages()):
             bar.value += 1
         bar.stop()
 
     @utils.ignore((requests.HTTPError, AttributeError))
     def _save_page(self, page):
         """Download contents, revisions, votes and discussion of the page."""
+        # source, history and votes only depend on the page id,
+        # so once it's known they can be requested at the same time
+        page_id = page._id
+        source = self.fetch_pool.submit(lambda: page.source)
+        votes = self.fetch_pool.submit(lambda: page.votes)
+        history = page.history
         orm.Page.create(
-            id=page._id, url=page.url, thread=page._thread._id, source=page.source
+            id=page_id,
+            url=page.url,
+            thread=page._thread._id,
+            source=source.result(),
         )
 
-        revisions = orm.User.convert_to_id(i._asdict() for i in page.history)
-        votes = orm.User.convert_to_id(i._asdict() for i in page.votes)
+        revisions = orm.User.convert_to_id(i._asdict() for i in history)
+        votes = orm.User.convert_to_id(i._asdict() for i in votes.result())
         tags = [{"tag": t} for t in page.tags]
         tags = orm.Tag.convert_to_id(tags, key="tag")
 
@@ -301,7 +346,7 @@ class SnapshotCreator:
         for cat in cats:
             threads = set(self.wiki.list_threads(cat.id))
             c_id = itertools.repeat(cat.id)
-            for _ in self.pool.map(self._save_thread, threads, c_id):
+            for _ in self._imap(self._save_thread, threads, c_id):
                 bar.value += 1
         bar.stop()
 
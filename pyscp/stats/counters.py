@@ -15,6 +15,10 @@ import re
 
 ###############################################################################
 
+RE_BLOCK = re.compile(r"[0-9]{3,4}$")
+
+###############################################################################
+
 
 def make_counter(pages, func, key):
     """Generic counter factory."""
@@ -47,7 +51,7 @@ def block(pages, func):
     def key(page):
         if "scp" not in page.tags:
             return
-        match = re.search(r"[0-9]{3,4}$", page.url)
+        match = RE_BLOCK.search(page.url)
         if not match:
             return
         match = int(match.group())
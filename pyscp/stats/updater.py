@@ -37,7 +37,7 @@ class Updater:
     def __init__(self, source, target):
         self.pages = list(source.list_pages())
         self.target = target
-        self.exist = [p.url for p in target.list_pages()]
+        self.exist = {p.url for p in target.list_pages()}
 
     @staticmethod
     def source_counter(counter):
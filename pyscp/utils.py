@@ -4,13 +4,19 @@
 # Module Imports
 ###############################################################################
 
+import atexit
+import collections
 import logging
+import logging.handlers
+import queue
 import re
 import time
 import threading
 import signal
+import sys
 import functools
 import inspect
+import itertools
 
 ###############################################################################
 # Decorators
@@ -31,8 +37,8 @@ class Call:
 
 
 def decorator(deco):
-    spec = inspect.getargspec(deco)
-    if len(spec.args) > 1 or spec.varargs or spec.keywords:
+    spec = inspect.getfullargspec(deco)
+    if len(spec.args) > 1 or spec.varargs or spec.varkw:
 
         @functools.wraps(deco)
         def _fab(*dargs, **dkwargs):
@@ -58,42 +64,72 @@ def make_decorator(deco, *dargs, **dkwargs):
 ###############################################################################
 
 
-@decorator
-def listify(call, wrapper=list):
-    return wrapper(call())
+# The decorators below are written out by hand rather than with the
+# decorator decorator, to avoid creating a Call object on every call.
 
 
-@decorator
-def morph(call, catch_exc, raise_exc):
-    try:
-        return call()
-    except catch_exc as error:
-        raise raise_exc(error) from error
+def listify(wrapper=list):
+    def _decorator(func):
+        @functools.wraps(func)
+        def _wrapper(*args, **kwargs):
+            return wrapper(func(*args, **kwargs))
 
+        return _wrapper
 
-@decorator
-def ignore(call, error=Exception, value=None):
-    try:
-        return call()
-    except error:
-        return value
+    return _decorator
 
 
-@decorator
-def log_errors(call, logger=print):
-    try:
-        return call()
-    except Exception as error:
-        logger(error)
-        raise (error)
+def morph(catch_exc, raise_exc):
+    def _decorator(func):
+        @functools.wraps(func)
+        def _wrapper(*args, **kwargs):
+            try:
+                return func(*args, **kwargs)
+            except catch_exc as error:
+                raise raise_exc(error) from error
 
+        return _wrapper
+
+    return _decorator
 
-@decorator
-def decochain(call, *decs):
-    fn = call.func
-    for dec in reversed(decs):
-        fn = dec(fn)
-    return fn(*call.args, **call.kwargs)
+
+def ignore(error=Exception, value=None):
+    def _decorator(func):
+        @functools.wraps(func)
+        def _wrapper(*args, **kwargs):
+            try:
+                return func(*args, **kwargs)
+            except error:
+                return value
+
+        return _wrapper
+
+    return _decorator
+
+
+def log_errors(logger=print):
+    def _decorator(func):
+        @functools.wraps(func)
+        def _wrapper(*args, **kwargs):
+            try:
+                return func(*args, **kwargs)
+            except Exception as error:
+                logger(error)
+                raise
+
+        return _wrapper
+
+    return _decorator
+
+
+def decochain(*decs):
+    def _decorator(func):
+        # compose the chain once, at decoration time
+        for dec in reversed(decs):
+            func = dec(func)
+        return func
+
+    return _decorator
 
 
 class cached_property:
@@ -112,57 +148,167 @@ class cached_property:
 ###############################################################################
 
 
+@functools.lru_cache(maxsize=128)
+def _split_pattern(delimeters):
+    return re.compile("|".join(map(re.escape, delimeters)))
+
+
+@functools.lru_cache(maxsize=128)
+def _split_table(delimeters):
+    sentinel = min(delimeters)
+    return str.maketrans(dict.fromkeys(delimeters, sentinel)), sentinel
+
+
+def _splitter(delimeters):
+    delimeters = tuple(delimeters)
+    if delimeters and all(len(d) == 1 for d in delimeters):
+        # for single characters, mapping all of them onto one and using
+        # str.split is considerably faster than the regex engine
+        table, sentinel = _split_table(frozenset(delimeters))
+        return lambda text: text.translate(table).split(sentinel)
+    return _split_pattern(delimeters).split
+
+
 def split(text, delimeters):
-    pattern = "|".join(map(re.escape, delimeters))
-    return re.split(pattern, text)
+    return _splitter(delimeters)(text)
+
+
+def split_many(texts, delimeters):
+    split = _splitter(delimeters)
+    return [split(text) for text in texts]
+
+
+def collapse_whitespace(string):
+    """
+    Collapse whitespace-only strings the way BeautifulSoup does.
+
+    Strings that consist entirely of whitespace are replaced with a single
+    newline if they contain one, and with a single space otherwise.
+    """
+    if not string or string.strip(" \t\n\r\f"):
+        return string
+    return "\n" if "\n" in string else " "
+
+
+def imap(pool, fn, *iterables, ahead):
+    """
+    Lazy version of Executor.map.
+
+    Executor.map consumes the whole input before yielding anything. Here, at
+    most `ahead` tasks are in flight at any given time, and the ones still
+    pending are cancelled if the iteration is abandoned.
+    """
+    pending = collections.deque()
+    try:
+        for args in zip(*iterables):
+            if len(pending) >= ahead:
+                yield pending.popleft().result()
+            pending.append(pool.submit(fn, *args))
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+BAR_PARTS = " ▏▎▍▌▋▊▉"
+# every possible state of a 40-cell bar, indexed by the number of filled parts
+BAR_STATES = [
+    ("█" * (i // len(BAR_PARTS)) + BAR_PARTS[i % len(BAR_PARTS)] + " " * 40)[:40]
+    for i in range(40 * len(BAR_PARTS) + 1)
+]
 
 
 class ProgressBar:
+    __slots__ = (
+        "title",
+        "max_value",
+        "value",
+        "time_started",
+        "_prefix",
+        "_done",
+        "_thread",
+        "_prev_sig",
+        "_last_paint",
+        "_last_line",
+        "_last_value",
+    )
+
+    # minimum number of seconds between two repaints
+    interval = 0.05
+
     def __init__(self, title, max_value):
         self.title = title
         self.max_value = max_value
         self.value = 0
-        signal.signal(signal.SIGINT, self.exit)
+        # the parts of the line that never change are formatted only once
+        self._prefix = "{} |".format(title)
+        self._done = threading.Event()
 
     def start(self):
-        self.finished = False
-        self.time_started = time.time()
-        threading.Thread(target=self.run).start()
+        # signal handlers can only be installed from the main thread
+        if threading.current_thread() is threading.main_thread():
+            self._prev_sig = signal.signal(signal.SIGINT, self.exit)
+        else:
+            self._prev_sig = None
+        self._done.clear()
+        self.time_started = time.monotonic()
+        self._last_paint = 0
+        self._last_line = None
+        self._last_value = None
+        self._thread = threading.Thread(target=self.run, daemon=True)
+        self._thread.start()
 
     def update(self):
-        print(self.line() + "\r", end="")
+        now = time.monotonic()
+        if now - self._last_paint < self.interval:
+            return
+        self._last_paint = now
+        self._last_value = self.value
+        line = self.line()
+        if line == self._last_line:
+            return
+        self._last_line = line
+        # return to the start of the line first, so that the cursor rests
+        # after the bar rather than on top of it between repaints
+        sys.stdout.write("\r" + line)
+        sys.stdout.flush()
 
     def line(self):
-        filled = 40 * self.value / self.max_value
-        parts = " ▏▎▍▌▋▊▉"
-        current = int(filled * len(parts)) % len(parts)
-        bar = "█" * int(filled) + parts[current] + " " * 40
-        tm = time.gmtime(time.time() - self.time_started)
-        return "{} |{}| {:>3}% ({}:{:02}:{:02})   ".format(
-            self.title,
-            bar[:40],
-            100 * self.value // self.max_value,
-            tm.tm_hour,
-            tm.tm_min,
-            tm.tm_sec,
+        total = self.max_value or 1
+        filled = 40 * self.value / total
+        bar = BAR_STATES[min(int(filled * len(BAR_PARTS)), len(BAR_STATES) - 1)]
+        hours, seconds = divmod(int(time.monotonic() - self.time_started), 3600)
+        minutes, seconds = divmod(seconds, 60)
+        return self._prefix + "{}| {:>3}% ({}:{:02}:{:02})   ".format(
+            bar, 100 * self.value // total, hours, minutes, seconds
         )
 
     def run(self):
-        while not self.finished:
+        while not self._done.wait(1):
             self.update()
-            time.sleep(1)
 
     def stop(self):
-        self.finished = True
-        print(self.line())
+        self._done.set()
+        self._thread.join()
+        if self._prev_sig is not None:
+            signal.signal(signal.SIGINT, self._prev_sig)
+        if self._last_line is None or self.value != self._last_value:
+            self._last_line = self.line()
+        sys.stdout.write("\r" + self._last_line + "\n")
+        sys.stdout.flush()
 
     def exit(self, signum, frame):
         self.stop()
         raise KeyboardInterrupt
 
 
-def pbar(it, title=None, max=None):
+def pbar(it, title=None, max=None, min_items=32):
     max = len(it) if max is None else max
+    if max < min_items or not sys.stdout.isatty():
+        # not worth starting a thread for, or nobody to show the bar to
+        yield from it
+        return
     title = "" if title is None else title + " "
     bar = ProgressBar(title, max)
     bar.start()
@@ -177,15 +323,42 @@ def pbar(it, title=None, max=None):
 
 
 class LogCount:
+    __slots__ = ("_counter",)
+
     def __init__(self):
-        self.count = 1
+        # next() on itertools.count is atomic, unlike reading and
+        # incrementing an attribute from several threads
+        self._counter = itertools.count(1)
 
     def filter(self, record):
-        record.count = self.count
-        self.count += 1
+        record.count = next(self._counter)
         return True
 
 
+class BufferedFileHandler(logging.FileHandler):
+    """File handler that only flushes to disk on warnings and above."""
+
+    buffer_size = 65536
+
+    def _open(self):
+        return open(
+            self.baseFilename,
+            self.mode,
+            buffering=self.buffer_size,
+            encoding=self.encoding,
+        )
+
+    def emit(self, record):
+        if self.stream is None:
+            self.stream = self._open()
+        try:
+            self.stream.write(self.format(record) + self.terminator)
+            if record.levelno >= logging.WARNING:
+                self.flush()
+        except Exception:
+            self.handleError(record)
+
+
 def log_sql_debug():
     logger = logging.getLogger("peewee")
     logger.setLevel(logging.DEBUG)
@@ -197,7 +370,7 @@ def log_sql_debug():
 
 def default_logging(debug=False):
     term = logging.StreamHandler()
-    file = logging.FileHandler("pyscp.log", mode="a", delay=True)
+    file = BufferedFileHandler("pyscp.log", mode="a", delay=True)
     if debug:
         term.setLevel(logging.DEBUG)
         file.setLevel(logging.DEBUG)
@@ -208,10 +381,22 @@ def default_logging(debug=False):
     file.setFormatter(
         logging.Formatter("{asctime} {levelname:8s} {message}", style="{")
     )
+    # the actual handlers run on a background thread, so that logging
+    # calls don't block on terminal or disk i/o
+    records = queue.Queue(-1)
+    listener = logging.handlers.QueueListener(
+        records, term, file, respect_handler_level=True
+    )
+    listener.start()
+    atexit.register(listener.stop)
+    # filter on the calling thread, before the record is formatted and
+    # queued, or every debug call would pay for a message nobody sees
+    level = logging.DEBUG if debug else logging.INFO
+    handler = logging.handlers.QueueHandler(records)
+    handler.setLevel(level)
     logger = logging.getLogger("pyscp")
-    logger.setLevel(logging.DEBUG)
-    logger.addHandler(term)
-    logger.addHandler(file)
+    logger.setLevel(level)
+    logger.addHandler(handler)
 
 
 ###############################################################################
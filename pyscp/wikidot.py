@@ -13,12 +13,16 @@ and communication with the Wikidot-hosted sites.
 
 from datetime import datetime
 import bs4
+import concurrent.futures
 import functools
 import itertools
 import logging
+import lxml.etree
+import lxml.html
 import pyscp
 import re
 import requests
+import soupsieve
 
 ###############################################################################
 # Global Constants And Variables
@@ -26,6 +30,53 @@ import requests
 
 log = logging.getLogger(__name__)
 
+RE_PAGE_ID = re.compile("pageId = ([0-9]+);")
+RE_USER_ID = re.compile("userId = ([0-9]+);")
+RE_FILE_ID = re.compile("event, ([0-9]+)")
+
+# precompiled queries, so the selectors are not parsed again on every call
+XPATH_DISCUSS = lxml.etree.XPath('//*[@id="discuss-button"]/@href')
+XPATH_CONTENT = lxml.etree.XPath('//*[@id="main-content"]')
+XPATH_TAGS = lxml.etree.XPath(
+    '//*[contains(concat(" ", normalize-space(@class), " "), " page-tags ")]//a'
+)
+XPATH_SOURCE = lxml.etree.XPath(
+    '//div[contains(concat(" ", normalize-space(@class), " "), " page-source ")]'
+)
+XPATH_TEXTS = lxml.etree.XPath(".//text()")
+XPATH_PAGER = lxml.etree.XPath(
+    'string(//*[contains(concat(" ", normalize-space(@class), " "), " pager-no ")])'
+)
+
+SEL_LIST_PAGES_ITEM = soupsieve.compile("div.list-pages-item")
+SEL_PAGE_FILES = soupsieve.compile("table.page-files")
+SEL_TITLE_LINK = soupsieve.compile(".title a")
+
+# tags and attributes that BeautifulSoup writes out in its own way,
+# element_html follows the same rules
+VOID_TAGS = frozenset(
+    "area base basefont bgsound br col command embed frame hr image img input "
+    "isindex keygen link menuitem meta nextid param source spacer track wbr".split()
+)
+RAW_TEXT_TAGS = frozenset(["script", "style"])
+PRESERVE_WHITESPACE_TAGS = frozenset(["pre", "textarea"])
+LIST_ATTRIBUTES = {
+    "*": frozenset(["class", "accesskey", "dropzone"]),
+    "a": frozenset(["rel", "rev"]),
+    "link": frozenset(["rel", "rev"]),
+    "td": frozenset(["headers"]),
+    "th": frozenset(["headers"]),
+    "form": frozenset(["accept-charset"]),
+    "object": frozenset(["archive"]),
+    "area": frozenset(["rel"]),
+    "icon": frozenset(["sizes"]),
+    "iframe": frozenset(["sandbox"]),
+    "output": frozenset(["for"]),
+}
+
+# number of module pages a wiki fetches concurrently, across all _pager calls
+PAGER_WORKERS = 4
+
 
 ###############################################################################
 # Utility Classes
@@ -35,17 +86,25 @@ log = logging.getLogger(__name__)
 class InsistentRequest(requests.Session):
     """Make an auto-retrying request that handles connection loss."""
 
-    def __init__(self, max_attempts=10):
+    def __init__(self, max_attempts=10, pool_size=32):
         super().__init__()
         self.max_attempts = max_attempts
+        # the default pool only keeps 10 connections alive, which is less
+        # than the number of threads used by the snapshot creator
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=pool_size, pool_maxsize=pool_size
+        )
+        self.mount("http://", adapter)
+        self.mount("https://", adapter)
 
     def __repr__(self):
         return "{}(max_attempts={})".format(self.__class__.__name__, self.max_attempts)
 
     def request(self, method, url, **kwargs):
-        logged_kwargs = hide_pass(kwargs)
-        logged_kwargs = repr(logged_kwargs) if logged_kwargs else ""
-        log.debug("%s: %s %s", method, url, logged_kwargs)
+        if log.isEnabledFor(logging.DEBUG):
+            logged_kwargs = hide_pass(kwargs)
+            logged_kwargs = repr(logged_kwargs) if logged_kwargs else ""
+            log.debug("%s: %s %s", method, url, logged_kwargs)
 
         kwargs.setdefault("timeout", 60)
         kwargs.setdefault("allow_redirects", False)
@@ -93,6 +152,8 @@ def hide_pass(nested_dict):
 class Page(pyscp.core.Page):
     """Create Page object."""
 
+    __slots__ = ("_body",)
+
     def __init__(self, wiki, url):
         super().__init__(wiki, url)
         self._body = {}
@@ -126,12 +187,13 @@ class Page(pyscp.core.Page):
     @pyscp.utils.cached_property
     def _pdata(self):
         data = self._wiki.req.get(self.url).text
-        soup = bs4.BeautifulSoup(data, "lxml")
+        tree = lxml.html.fromstring(data)
+        content = XPATH_CONTENT(tree)
         return (
-            int(re.search("pageId = ([0-9]+);", data).group(1)),
-            parse_element_id(soup.find(id="discuss-button")),
-            str(soup.find(id="main-content")),
-            {e.text for e in soup.select(".page-tags a")},
+            int(RE_PAGE_ID.search(data).group(1)),
+            parse_href_id(next(iter(XPATH_DISCUSS(tree)), None)),
+            element_html(content[0]) if content else None,
+            {e.text_content() for e in XPATH_TAGS(tree)},
         )
 
     @property
@@ -189,10 +251,14 @@ class Page(pyscp.core.Page):
     @property
     def source(self):
         data = self._module("viewsource/ViewSourceModule")["body"]
-        soup = bs4.BeautifulSoup(data, "lxml")
-        return "".join(
-            [s + "\n" for s in soup.text.replace("\t", "").split("\n")[1:]][1:]
-        )
+        body = lxml.html.fragment_fromstring(data, create_parent=True)
+        source = XPATH_SOURCE(body)
+        if not source:
+            return ""
+        texts = XPATH_TEXTS(source[0]) + [source[0].tail or ""]
+        text = "".join(map(pyscp.utils.collapse_whitespace, texts))
+        # the first line is the one the opening tag of the div is on
+        return "".join(s + "\n" for s in text.replace("\t", "").split("\n")[1:])
 
     @property
     def created(self):
@@ -212,13 +278,14 @@ class Page(pyscp.core.Page):
         """List all files attached to the page."""
         data = self._module("files/PageFilesModule")["body"]
         soup = bs4.BeautifulSoup(data, "lxml")
-        if not soup.select("table.page-files"):
+        table = SEL_PAGE_FILES.select_one(soup)
+        if not table:
             return []
-        files = soup.select("table.page-files")[0]("tr")[1:]
+        files = table("tr")[1:]
         parsed = []
         for file in files:
             url = self._wiki.site + file.find("a")["href"]
-            file_id = int(re.search("event, ([0-9]+)", str(file)).group(1))
+            file_id = int(RE_FILE_ID.search(str(file)).group(1))
             name = file.find("a").text.strip()
             filetype = file("td")[1].text.strip()
             size = file("td")[2].text.strip()
@@ -234,7 +301,7 @@ class Page(pyscp.core.Page):
         try:
             if title is None:
                 title = self._raw_title
-            self._flush("html", "history", "source")
+            self._flush("html", "_parsed", "text", "history", "source")
             wiki_page = self.url.split("/")[-1]
             lock = self._module(
                 "edit/PageEditModule", mode="page", wiki_page=wiki_page, force_lock=True
@@ -262,13 +329,13 @@ class Page(pyscp.core.Page):
 
     def revert(self, rev_n):
         """Revert the page to a previous revision."""
-        self._flush("html", "history", "source", "tags")
+        self._flush("html", "_parsed", "text", "history", "source", "tags")
         return self._action("revert", revisionId=self.history[rev_n].id)
 
     def set_tags(self, tags):
         """Replace the tags of the page."""
         res = self._action("saveTags", tags=" ".join(tags))
-        self._flush("history", "_pdata")
+        self._flush("history", "_pdata", "_parsed", "text")
         return res
 
     def upload(self, name, data):
@@ -384,10 +451,15 @@ class Wiki(pyscp.core.Wiki):
     # Special Methods
     ###########################################################################
 
-    def __init__(self, site):
+    def __init__(self, site, pool_size=32):
         super().__init__(site)
-        self.req = InsistentRequest()
+        self.req = InsistentRequest(pool_size=pool_size)
         self.cookies = "wikidot_token7=123456;"
+        # shared by every _pager call, so that callers running in parallel
+        # don't each start their own threads on top of one another
+        self._pager_pool = concurrent.futures.ThreadPoolExecutor(
+            max_workers=PAGER_WORKERS
+        )
 
     def __repr__(self):
         return "{}.{}({})".format(
@@ -431,12 +503,17 @@ class Wiki(pyscp.core.Wiki):
         """Iterate over multi-page module results."""
         first_page = self._module(_name, **kwargs)
         yield first_page
-        counter = bs4.BeautifulSoup(first_page["body"], "lxml").find(class_="pager-no")
+        body = lxml.html.fragment_fromstring(first_page["body"], create_parent=True)
+        counter = XPATH_PAGER(body)
         if not counter:
             return
-        for idx in range(2, int(counter.text.split(" ")[-1]) + 1):
-            kwargs.update({_key: idx if _update is None else _update(idx)})
-            yield self._module(_name, **kwargs)
+
+        def fetch(idx):
+            page = {_key: idx if _update is None else _update(idx)}
+            return self._module(_name, **dict(kwargs, **page))
+
+        pages = range(2, int(counter.split(" ")[-1]) + 1)
+        yield from pyscp.utils.imap(self._pager_pool, fetch, pages, ahead=PAGER_WORKERS)
 
     def _list_pages_raw(self, **kwargs):
         """
@@ -467,7 +544,7 @@ class Wiki(pyscp.core.Wiki):
         kwargs["created_by"] = kwargs.pop("author", None)
         lists = self._list_pages_raw(**kwargs)
         soups = (bs4.BeautifulSoup(p["body"], "lxml") for p in lists)
-        pages = (s.select("div.list-pages-item") for s in soups)
+        pages = (SEL_LIST_PAGES_ITEM.select(s) for s in soups)
         pages = itertools.chain.from_iterable(pages)
         for page in pages:
             data = {r("td")[0].text: r("td")[1].text.strip() for r in page("tr")}
@@ -489,7 +566,7 @@ class Wiki(pyscp.core.Wiki):
         )
         if self.custom_domain == True:
             cd = self.req.get(self.site)
-            soup = bs4.BeautifulSoup(cd.text, "html.parser")
+            soup = bs4.BeautifulSoup(cd.text, "lxml")
             s = soup.find_all("script")
 
             for i in s:
@@ -516,7 +593,7 @@ class Wiki(pyscp.core.Wiki):
         data = self._module("forum/ForumStartModule")["body"]
         soup = bs4.BeautifulSoup(data, "lxml")
         for elem in [e.parent for e in soup(class_="name")]:
-            cat_id = parse_element_id(elem.select(".title a")[0])
+            cat_id = parse_element_id(SEL_TITLE_LINK.select(elem, limit=1)[0])
             title, description, size = [
                 elem.find(class_=i).text.strip()
                 for i in ("title", "description", "threads")
@@ -529,7 +606,7 @@ class Wiki(pyscp.core.Wiki):
         soups = (bs4.BeautifulSoup(p["body"], "lxml") for p in pages)
         elems = (s(class_="name") for s in soups)
         for elem in itertools.chain(*elems):
-            thread_id = parse_element_id(elem.select(".title a")[0])
+            thread_id = parse_element_id(SEL_TITLE_LINK.select(elem, limit=1)[0])
             title, description = [
                 elem.find(class_=i).text.strip() for i in ("title", "description")
             ]
@@ -567,8 +644,7 @@ class Wiki(pyscp.core.Wiki):
     @property
     def title(self):
         data = self.req.get(self.site).text
-        soup = bs4.BeautifulSoup(data, "lxml")
-        return soup.title.string
+        return lxml.html.fromstring(data).findtext(".//title")
 
     ###########################################################################
     # SCP-Wiki Specific Methods
@@ -581,7 +657,7 @@ class Wiki(pyscp.core.Wiki):
             return
         base = "http://scpsandbox2.wikidot.com/image-review-{}"
         urls = [base.format(i) for i in range(1, 36)]
-        pages = [self.req.get(u).text for u in urls]
+        pages = list(self._pager_pool.map(lambda u: self.req.get(u).text, urls))
         soups = [bs4.BeautifulSoup(p, "lxml") for p in pages]
         elems = [s("tr") for s in soups]
         elems = itertools.chain(*elems)
@@ -667,8 +743,7 @@ class User(pyscp.core.User):
     @property
     def id(self):
         data = self.req.get(self.url).text
-        soup = bs4.BeautifulSoup(data, "lxml")
-        return int(re.search("userId = ([0-9]+);", data).group(1))
+        return int(RE_USER_ID.search(data).group(1))
 
     ###########################################################################
     # Properties
@@ -720,7 +795,13 @@ class User(pyscp.core.User):
 @pyscp.utils.ignore((IndexError, TypeError))
 def parse_element_id(element):
     """Extract the id number from the link."""
-    return int(element["href"].split("/")[2].split("-")[1])
+    return parse_href_id(element["href"])
+
+
+@pyscp.utils.ignore((IndexError, AttributeError))
+def parse_href_id(href):
+    """Extract the id number from the href of the link."""
+    return int(href.split("/")[2].split("-")[1])
 
 
 def parse_element_time(element):
@@ -729,6 +810,67 @@ def parse_element_time(element):
     return datetime.utcfromtimestamp(unixtime).strftime("%Y-%m-%d %H:%M:%S")
 
 
+def element_html(element):
+    """
+    Serialize the element the same way str() of a BeautifulSoup tag does.
+
+    Void elements are self-closed and whitespace-only strings are collapsed,
+    so the markup stays XHTML-style. Boolean attributes are the exception:
+    lxml can't tell `checked` from `checked="checked"`, so both are written
+    out as the latter.
+    """
+    parts = []
+    _write_element(element, parts, False)
+    return "".join(parts)
+
+
+def _write_element(element, parts, preserve):
+    name = element.tag
+    if not isinstance(name, str):  # comment
+        text = element.text or ""
+        parts.append("<!--{}-->".format(_collapse(text, preserve)))
+        return
+    parts.append("<" + name)
+    listed = LIST_ATTRIBUTES["*"] | LIST_ATTRIBUTES.get(name, frozenset())
+    for key, value in element.attrib.items():
+        if key in listed:
+            value = " ".join(value.split())
+        parts.append(" {}={}".format(key, _quote(_escape(value))))
+    if name in VOID_TAGS and not len(element) and not element.text:
+        parts.append("/>")
+        return
+    parts.append(">")
+    preserve = preserve or name in PRESERVE_WHITESPACE_TAGS
+    raw = name in RAW_TEXT_TAGS
+    _write_text(element.text, parts, preserve, raw)
+    for child in element:
+        _write_element(child, parts, preserve)
+        _write_text(child.tail, parts, preserve, raw)
+    parts.append("</{}>".format(name))
+
+
+def _write_text(text, parts, preserve, raw):
+    if text:
+        text = _collapse(text, preserve)
+        parts.append(text if raw else _escape(text))
+
+
+def _collapse(text, preserve):
+    return text if preserve else pyscp.utils.collapse_whitespace(text)
+
+
+def _escape(text):
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+def _quote(value):
+    if '"' not in value:
+        return '"{}"'.format(value)
+    if "'" not in value:
+        return "'{}'".format(value)
+    return '"{}"'.format(value.replace('"', "&quot;"))
+
+
 def crawl_posts(post_containers, parent=None):
     """
     Retrieve posts from the comment tree.
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+
+###############################################################################
+# Module Imports
+###############################################################################
+
+import bs4
+import lxml.html
+import pyscp
+import pytest
+import random
+
+###############################################################################
+
+WHITESPACE = ["", " ", "\n", "\n    ", "  \t", "\r\n", "\xa0", " x ", "a   b "]
+TEXT = ["a & b", "x <y> z", "\u00e9\u2014"]
+TAGS = ["p", "div", "pre", "textarea", "span", "script", "style", "ul", "li", "a"]
+VOID_TAGS = ["br", "hr", "img"]
+ATTRIBUTES = [
+    "",
+    ' class=" a  b "',
+    ' href="/scp-001?a=1&amp;b=2"',
+    " title='say \"hi\"'",
+    ' title="it\'s &quot;q&quot;"',
+    ' rel="nofollow  external"',
+    ' data-x=""',
+]
+
+
+def random_content(rng, depth=0):
+    content = rng.choice(WHITESPACE + TEXT)
+    for _ in range(rng.randint(0, 4)):
+        tag = rng.choice(TAGS + VOID_TAGS)
+        attrs = rng.choice(ATTRIBUTES)
+        if tag in VOID_TAGS:
+            content += "<{}{}{}>".format(tag, attrs, rng.choice(["", "/"]))
+        elif depth < 4:
+            inner = random_content(rng, depth + 1)
+            content += "<{0}{1}>{2}</{0}>".format(tag, attrs, inner)
+        content += rng.choice(WHITESPACE)
+        if rng.random() < 0.1:
+            content += "<!-- comment -->" + rng.choice(WHITESPACE)
+    return content
+
+
+def make_page(html):
+    page = pyscp.wikidot.Page(pyscp.wikidot.Wiki("test"), "test")
+    page._cache = {"_pdata": (None, None, html, None)}
+    return page
+
+
+@pytest.mark.parametrize("seed", range(200))
+def test_text_matches_beautifulsoup(seed):
+    content = random_content(random.Random(seed))
+    html = (
+        '<html><body><div id="main">\n'
+        '    <div id="page-content">{}</div>\n'
+        "</div></body></html>".format(content)
+    )
+    expected = bs4.BeautifulSoup(html, "lxml").find(id="page-content").text
+    assert make_page(html).text == expected
+
+
+@pytest.mark.parametrize("seed", range(200))
+def test_html_matches_beautifulsoup(seed):
+    content = random_content(random.Random(seed))
+    html = (
+        '<html><body>\n<div id="main-content">\n'
+        '    <div id="page-content">{}</div>\n'
+        "</div>\n</body></html>".format(content)
+    )
+    expected = str(bs4.BeautifulSoup(html, "lxml").find(id="main-content"))
+    content = pyscp.wikidot.XPATH_CONTENT(lxml.html.fromstring(html))[0]
+    assert pyscp.wikidot.element_html(content) == expected
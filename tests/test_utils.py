@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+
+###############################################################################
+# Module Imports
+###############################################################################
+
+import concurrent.futures
+import pyscp
+import pytest
+import random
+import re
+import threading
+import time
+
+###############################################################################
+
+ALPHABET = "ab,;. -\n|"
+
+
+def random_text(rng):
+    return "".join(rng.choice(ALPHABET) for _ in range(rng.randint(0, 30)))
+
+
+def reference_split(text, delimeters):
+    return re.split("|".join(map(re.escape, delimeters)), text)
+
+
+@pytest.mark.parametrize("seed", range(100))
+def test_split_many_single_characters(seed):
+    rng = random.Random(seed)
+    delimeters = rng.sample(",;. -\n|", rng.randint(1, 4))
+    texts = [random_text(rng) for _ in range(20)]
+    expected = [reference_split(t, delimeters) for t in texts]
+    assert pyscp.utils.split_many(texts, delimeters) == expected
+
+
+@pytest.mark.parametrize("seed", range(100))
+def test_split_many_mixed_lengths(seed):
+    rng = random.Random(seed)
+    delimeters = rng.sample([",", ". ", "--", "|", " - ", "\n\n"], rng.randint(1, 4))
+    texts = [random_text(rng) for _ in range(20)]
+    expected = [reference_split(t, delimeters) for t in texts]
+    assert pyscp.utils.split_many(texts, delimeters) == expected
+
+
+def test_split_accepts_any_iterable():
+    assert pyscp.utils.split("a,b;c", iter(",;")) == ["a", "b", "c"]
+    assert pyscp.utils.split("a, b. c", {", ", ". "}) == ["a", "b", "c"]
+
+
+class RecordingPool:
+    """Executor wrapper that remembers every future it hands out."""
+
+    def __init__(self, max_workers):
+        self.pool = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+        self.futures = []
+
+    def submit(self, fn, *args):
+        future = self.pool.submit(fn, *args)
+        self.futures.append(future)
+        return future
+
+
+def test_imap_keeps_order():
+    rng = random.Random(0)
+    delays = [rng.random() / 100 for _ in range(50)]
+
+    def work(idx, delay):
+        time.sleep(delay)
+        return idx
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=8) as pool:
+        result = list(pyscp.utils.imap(pool, work, range(50), delays, ahead=8))
+    assert result == list(range(50))
+
+
+@pytest.mark.parametrize("ahead", [1, 3, 10])
+def test_imap_bounds_tasks_in_flight(ahead):
+    pool = RecordingPool(max_workers=4)
+    for consumed, _ in enumerate(pyscp.utils.imap(pool, abs, range(30), ahead=ahead)):
+        assert len(pool.futures) <= consumed + ahead
+    assert len(pool.futures) == 30
+
+
+def test_imap_cancels_pending_tasks_when_closed():
+    release = threading.Event()
+
+    def work(idx):
+        if idx:
+            release.wait()
+        return idx
+
+    pool = RecordingPool(max_workers=1)
+    results = pyscp.utils.imap(pool, work, range(100), ahead=5)
+    assert next(results) == 0
+    results.close()
+    release.set()
+    assert len(pool.futures) == 5
+    # the second task already occupies the only worker, the rest never start
+    assert all(f.cancelled() for f in pool.futures[2:])